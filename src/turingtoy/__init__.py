@@ -1,3 +1,7 @@
+import json
+from functools import (
+    lru_cache,
+)
 from typing import (
     Dict,
     List,
@@ -14,10 +18,48 @@ from turingtoy.machine import (
 __version__ = poetry_version.extract(source_file=__file__)
 
 
+@lru_cache(maxsize=32)
+def _load_machine(machine_json: str) -> Machine:
+    """Build a Turing machine, reusing it when the same machine is run again.
+
+    Args:
+        machine_json: JSON representation of the machine
+
+    Returns:
+        validated and compiled machine
+    """
+    return Machine(json.loads(machine_json))
+
+
+def _get_machine(machine: Dict) -> Machine:
+    """Build a Turing machine, from the cache when JSON represents it exactly.
+
+    Args:
+        machine: Turing machine to build
+
+    Returns:
+        validated and compiled machine
+    """
+    # The machine is built for this run only when it is not JSON serializable
+    # (e.g. a set of final states) or does not load back the same (e.g. keys that
+    # are not strings), so that the cached machine always behaves like it
+    try:
+        machine_json = json.dumps(machine)
+    except TypeError:
+        return Machine(machine)
+
+    if json.loads(machine_json) != machine:
+        return Machine(machine)
+
+    return _load_machine(machine_json)
+
+
 def run_turing_machine(
     machine: Dict,
     input_: str,
     steps: int | None = None,
+    record_history: bool = False,
+    snapshot_tape: bool = True,
 ) -> Tuple[str, List, bool]:
     """Run a Turing machine.
 
@@ -25,14 +67,18 @@ def run_turing_machine(
         machine: Turing machine to run
         input_: input to the machine, it is the content at the beginning of the tape
         steps: maximum number of steps to run, if None run until the machine halts
+        record_history: whether to record the execution history, when False the
+            returned history is empty
+        snapshot_tape: whether to copy the tape in each history entry, when False
+            the memory of the entries is None
 
     Returns:
         Content of the tape after the machine halts. This is a tuple of the content of
         the tape, the execution history, and whether the machine has halted in a final state.
     """
     try:
-        turing_machine = Machine(machine)
+        turing_machine = _get_machine(machine)
     except ValueError as e:
         raise ValueError(f"Invalid machine: {e}") from e
 
-    return turing_machine.run(input_, steps)
+    return turing_machine.run(input_, steps, record_history, snapshot_tape)
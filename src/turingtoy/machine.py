@@ -7,14 +7,15 @@ Classes:
     Machine: a Turing machine
     State: a state of the machine
     Transition: a transition from one state to another
-    Write: write a character to the tape
-    Move: move the tape head in a direction
+    Instruction: write a character to the tape and move the tape head
     Direction: direction to move the tape head
 
 Exceptions:
     ValueError: if the machine is not valid
 """
 
+import logging
+import math
 from dataclasses import (
     dataclass,
 )
@@ -24,10 +25,23 @@ from enum import (
 )
 from typing import (
     Dict,
+    FrozenSet,
+    Iterable,
     List,
     Tuple,
 )
 
+logger = logging.getLogger(__name__)
+
+# Number of blank cells allocated on each side of the input when a run starts
+TAPE_PADDING = 64
+
+# Symbols accepted in the input of a machine
+INPUT_SYMBOLS = frozenset("01+*")
+
+# Maximum number of symbols in the tape alphabet, each cell of the tape is a byte
+ALPHABET_SIZE = 256
+
 
 @unique
 class Direction(Enum):
@@ -35,28 +49,24 @@ class Direction(Enum):
 
     RIGHT = "R"
     LEFT = "L"
+    NONE = "N"
 
 
-@dataclass
-class Move:
-    """Move the tape head in a direction.
+# Values of the directions, as written in a transition table
+DIRECTION_VALUES = frozenset(direction.value for direction in Direction)
 
-    Attributes:
-        direction: direction to move the tape head
-        state: state to transition to
-    """
-
-    direction: Direction
-    state: str
+# Offset of the tape head for each direction
+DIRECTION_DELTAS = {Direction.RIGHT: 1, Direction.LEFT: -1, Direction.NONE: 0}
 
 
 @dataclass
-class Write:
-    """Write a character to the tape.
+class Instruction:
+    """Write a character to the tape and move the tape head in a direction.
 
     Attributes:
-        character: character to write
+        character: character to write, None to leave the tape unchanged
         direction: direction to move the tape head
+        next_state: state to transition to
     """
 
     character: str | None
@@ -74,7 +84,7 @@ class Transition:
     """
 
     symbol: str
-    instruction: Write | Move
+    instruction: Instruction
 
 
 @dataclass
@@ -104,7 +114,20 @@ class Machine:
         blank: character to represent a blank cell
         start_state: initial state of the machine
         final_states: list of states that are considered final
+        final_state_ids: ids of the final states
         table: transition table
+        symbols: tape alphabet, indexed by symbol id
+        symbol_ids: id of each symbol of the tape alphabet, the blank is always 0
+        decode_table: bytes.translate table from symbol ids to the latin-1 code of
+            the symbols, None when a symbol is not a single latin-1 character
+        encode_table: bytes.translate table from the latin-1 code of the symbols to
+            their ids, None along with decode_table
+        states: state names, indexed by state id
+        state_ids: id of each state
+        transitions: flat dispatch table indexed by
+            state id * len(symbols) + symbol id, compiled to (written symbol id,
+            head move, next state id, entry of the transition in the machine table),
+            None when there is no transition
 
     Raises:
         ValueError: if the machine is not valid
@@ -113,7 +136,15 @@ class Machine:
     blank: str
     start_state: str
     final_states: List[str]
+    final_state_ids: FrozenSet[int]
     table: List[State]
+    symbols: List[str]
+    symbol_ids: Dict[str, int]
+    decode_table: bytearray | None
+    encode_table: bytearray | None
+    states: List[str]
+    state_ids: Dict[str, int]
+    transitions: List[Tuple[int, int, int, Dict | str] | None]
 
     def __init__(
         self,
@@ -124,9 +155,124 @@ class Machine:
         # we must validate the table first, as it is used in the other validations
         self.table = self._validate_table(machine["table"])
 
+        # Encode the alphabet so that the tape fits in a bytearray. The blank is
+        # registered first, a zeroed buffer is then a blank tape.
+        self.symbols = []
+        self.symbol_ids = {}
+        self.decode_table = bytearray(ALPHABET_SIZE)
+        self.encode_table = bytearray(ALPHABET_SIZE)
+        self._encode_symbol(self.blank)
+
+        # Register the input symbols as well, so that running the machine never
+        # changes it
+        for symbol in sorted(INPUT_SYMBOLS):
+            self._encode_symbol(symbol)
+
+        # Register the symbols of the table, the alphabet is then complete
+        for state in self.table:
+            for transition in state.transitions:
+                self._encode_symbol(transition.symbol)
+                if transition.instruction.character is not None:
+                    self._encode_symbol(transition.instruction.character)
+
+        # Number the states in table order, then the states that are only next
+        # states
+        self.states = []
+        self.state_ids = {}
+        for state in self.table:
+            self._encode_state(state.name)
+        for state in self.table:
+            for transition in state.transitions:
+                self._encode_state(transition.instruction.next_state)
+
+        # The transitions of a state are the len(symbols) entries starting at its
+        # id * len(symbols)
+        stride = len(self.symbols)
+        self.transitions = [None] * (len(self.states) * stride)
+        for state_id, state in enumerate(self.table):
+            base = state_id * stride
+            for transition in state.transitions:
+                instruction = transition.instruction
+                delta = DIRECTION_DELTAS[instruction.direction]
+
+                # A move writes back the symbol it reads, so that the run loop
+                # always writes
+                symbol_id = self.symbol_ids[transition.symbol]
+                write = symbol_id
+                if instruction.character is not None:
+                    write = self.symbol_ids[instruction.character]
+
+                # Compile the instruction so that the run loop does not have to
+                # inspect it
+                self.transitions[base + symbol_id] = (
+                    write,
+                    delta,
+                    self.state_ids[instruction.next_state],
+                    machine["table"][state.name][transition.symbol],
+                )
+
         # validate the start state and final states
         self.start_state = self._validate_start_state(machine["start state"])
         self.final_states = self._validate_final_states(machine["final states"])
+        self.final_state_ids = frozenset(
+            self.state_ids[state] for state in self.final_states
+        )
+
+    def _encode_symbol(self, symbol: str) -> int:
+        """Get the id of a tape symbol, adding it to the alphabet if needed.
+
+        Args:
+            symbol: tape symbol
+
+        Returns:
+            id of the symbol
+
+        Raises:
+            ValueError: if the alphabet does not fit in a byte anymore
+        """
+        symbol_id = self.symbol_ids.get(symbol)
+        if symbol_id is not None:
+            return symbol_id
+
+        symbol_id = len(self.symbols)
+        if symbol_id >= ALPHABET_SIZE:
+            raise ValueError(
+                f"Alphabet must not contain more than {ALPHABET_SIZE} symbols"
+            )
+
+        self.symbols.append(symbol)
+        self.symbol_ids[symbol] = symbol_id
+
+        # Keep the tape encodable and decodable in C as long as symbols fit in
+        # latin-1
+        if self.decode_table is not None and self.encode_table is not None:
+            if len(symbol) == 1 and ord(symbol) < 256:
+                self.decode_table[symbol_id] = ord(symbol)
+                self.encode_table[ord(symbol)] = symbol_id
+            else:
+                self.decode_table = None
+                self.encode_table = None
+
+        return symbol_id
+
+    def _encode_state(self, state: str) -> int:
+        """Get the id of a state, adding it if needed.
+
+        Args:
+            state: state name
+
+        Returns:
+            id of the state
+        """
+        state_id = self.state_ids.get(state)
+        if state_id is not None:
+            return state_id
+
+        state_id = len(self.states)
+        self.states.append(state)
+        self.state_ids[state] = state_id
+
+        return state_id
 
     def _validate_start_state(self, start_state: str) -> str:
         """Validate start state.
@@ -147,11 +293,11 @@ class Machine:
 
         raise ValueError("Start state not in transition table")
 
-    def _validate_final_states(self, final_states: List[str]) -> List[str]:
+    def _validate_final_states(self, final_states: Iterable[str]) -> List[str]:
         """Validate final states.
 
         Args:
-            final_states: list of final states
+            final_states: final states
 
         Returns:
             list of final states
@@ -159,15 +305,11 @@ class Machine:
         Raises:
             ValueError: if a final state is not in the table
         """
-        tmp = final_states.copy()
-
         # Validate that all final states are in the table
-        for state in self.table:
-            if state.name in final_states:
-                tmp.remove(state.name)
+        missing = set(final_states) - {state.name for state in self.table}
 
-        if not tmp:
-            return final_states
+        if not missing:
+            return list(final_states)
 
         raise ValueError("Final state not in transition table")
 
@@ -184,26 +326,24 @@ class Machine:
             ValueError: if the table is not valid
         """
         # Validate that all states are in the table
-        for state in table:
-            for symbol in table[state]:
-                if isinstance(table[state][symbol], str):
+        for state, symbols in table.items():
+            # Validate that the state and its symbols are strings
+            if not isinstance(state, str):
+                raise ValueError(f"State {state!r} must be a string")
+
+            for symbol, symbol_dict in symbols.items():
+                if not isinstance(symbol, str):
+                    raise ValueError(
+                        f"Symbol {symbol!r} of state {state} must be a string"
+                    )
+
+                if isinstance(symbol_dict, str):
                     # TODO: validate that the state is in the table
                     # Handling is different as the state is not a dict
                     continue
 
-                symbol_dict = table[state][symbol]
-                direction = (
-                    Direction.LEFT.value
-                    if symbol_dict.get(Direction.LEFT.value)
-                    else Direction.RIGHT.value
-                )
-
-                # Validate that the move symbol is a valid direction
-                if direction not in [d.value for d in Direction]:
-                    raise ValueError(
-                        f"Write symbol for {symbol_dict} must be '{Direction.LEFT.value}'"
-                        f" or '{Direction.RIGHT.value}'"
-                    )
+                # Validate that the instruction has a move symbol
+                direction = self._direction_key(symbol_dict)
 
                 # Check write symbol
                 if symbol_dict.get("write"):
@@ -225,23 +365,31 @@ class Machine:
                             f"Move state for symbole {symbol_dict} not in transition table"
                         )
 
-                # Check move symbol
-                else:
-                    # Validate that the move symbol is a single character
-                    if len(direction) != 1:
-                        raise ValueError(
-                            f"Move symbol for {symbol_dict} must be a single character"
-                        )
-
-                    # Validate that the move symbol is a valid direction
-                    if direction not in [d.value for d in Direction]:
-                        raise ValueError(
-                            f"Move symbol for {symbol_dict} must be 'L' or 'R'"
-                        )
-
         # Convert table to a list of Transition objects
         return self._convert_table(table)
 
+    @staticmethod
+    def _direction_key(actions: dict) -> str:
+        """Find the move symbol of an instruction.
+
+        Args:
+            actions: instruction of the transition table
+
+        Returns:
+            the move symbol, whose value is the next state
+
+        Raises:
+            ValueError: if the instruction does not have exactly one move symbol
+        """
+        keys = [key for key in actions if key in DIRECTION_VALUES]
+        if len(keys) != 1:
+            raise ValueError(
+                f"Instruction {actions} must have exactly one move symbol among "
+                "'L', 'R' and 'N'"
+            )
+
+        return keys[0]
+
     def _convert_table(self, table: dict) -> List[State]:
         """Convert the table to a list of State objects.
 
@@ -257,26 +405,29 @@ class Machine:
             transitions = []
 
             for symbol, actions in symbols.items():
-                instruction = None
-                direction = (
-                    Direction.RIGHT
-                    if actions.get(Direction.RIGHT.value)
-                    else Direction.LEFT
-                )
-
-                # write symbol
-                if "write" in actions:
-                    instruction = Write(
-                        character=actions["write"],
-                        direction=direction,
-                        next_state=actions[direction.value],
-                    )
-                # move symbol
-                else:
-                    instruction = Move(
-                        direction=direction,
-                        state=actions[direction.value],
+                # move symbol without state change
+                if isinstance(actions, str):
+                    transitions.append(
+                        Transition(
+                            symbol=symbol,
+                            instruction=Instruction(
+                                character=None,
+                                direction=Direction(actions),
+                                next_state=state,
+                            ),
+                        )
                     )
+                    continue
+
+                # the next state is the value of the move symbol
+                direction = self._direction_key(actions)
+
+                # a move symbol is an instruction that does not write
+                instruction = Instruction(
+                    character=actions.get("write"),
+                    direction=Direction(direction),
+                    next_state=actions[direction],
+                )
 
                 transitions.append(Transition(symbol=symbol, instruction=instruction))
 
@@ -294,17 +445,27 @@ class Machine:
             ValueError: if the input contains invalid characters
         """
         # Validate that the input only contains 0 and 1
-        if not all(c in ["0", "1", "+", "*"] for c in input_):
+        if not INPUT_SYMBOLS.issuperset(input_):
             raise ValueError("Input must only contain '0' and '1'")
 
         return input_
 
-    def run(self, input_: str, steps: int | None = None) -> Tuple[str, List, bool]:
+    def run(
+        self,
+        input_: str,
+        steps: int | None = None,
+        record_history: bool = False,
+        snapshot_tape: bool = True,
+    ) -> Tuple[str, List, bool]:
         """Run the Turing machine.
 
         Args:
             input_: input to the machine
             steps: maximum number of steps to run
+            record_history: whether to record the execution history, when False the
+                returned history is empty
+            snapshot_tape: whether to copy the tape in each history entry, when
+                False the memory of the entries is None
 
         Returns:
             Content of the tape after the machine halts. This is a tuple of the content of
@@ -312,129 +473,169 @@ class Machine:
         """
         machine_input = self._validate_input(input_)
 
-        # Initialize the tape and its head
-        tape = list(machine_input)
-        tape.append(self.blank)
-        print(f"Initial tape: {tape}")
+        # Bind invariants to locals, they are read on every step
+        symbols = self.symbols
+        states = self.states
+        transitions = self.transitions
+        stride = len(symbols)
+        final_states = self.final_state_ids
+        debug = logger.isEnabledFor(logging.DEBUG)
+
+        # Initialize the tape, the visible part of the buffer is [left, right) and
+        # the blank cell after the input is part of it
+        tape = bytearray(TAPE_PADDING)
+        tape += self._encode(machine_input)
+        tape += bytearray(TAPE_PADDING)
+        left = TAPE_PADDING
+        right = left + len(machine_input) + 1
 
         # Initialize the state
-        current_state = self.start_state
-        print(f"Initial state: {current_state}")
+        current_state = self.state_ids[self.start_state]
 
-        # Initialize the tape head position
-        position = 0
-        print(f"Initial position: {position}")
+        # Offset of the transitions of the current state, only computed again when
+        # it changes
+        base = current_state * stride
+
+        # Initialize the tape head, as an index in the buffer. Its position on the
+        # visible tape is head - left.
+        head = left
 
         # Initialize the execution history
         execution_history = []
 
         # Initialize the number of steps
         count = 0
-        if steps is None:
-            steps = 0  # this will not trigger the break condition
+        max_steps = math.inf if steps is None else steps
 
         # Run the machine
-        while True:
-            # Get the current symbol
-            symbol = tape[position]
-            print(f"- Current tape symbol: {symbol}")
-
-            current_transition = None
-
-            # Find the current state in the table
-            for state in self.table:
-                if state.name != current_state:
-                    continue
-
-                for transition in state.transitions:
-                    if transition.symbol != symbol:
-                        continue
-
-                    current_transition = transition
-                    break
+        while count < max_steps:
+            # Find the transition for the current state and symbol
+            compiled = transitions[base + tape[head]]
 
             # If no transition is found, halt
-            if current_transition is None:
+            if compiled is None:
                 break
 
-            print(f"|  State (position={position}): {current_transition}")
-
-            # Execute the transition
-            if isinstance(current_transition.instruction, Write):
-                # Write the character to the tape
-                tape[position] = current_transition.instruction.character
-
-                # Update the current state
-                state = current_transition.instruction.next_state
-
-            elif isinstance(current_transition.instruction, Move):
-                # Update the current state
-                state = current_transition.instruction.state
-
-            print(f"|  New tape: {tape}")
+            write, delta, state, transition = compiled
+            if debug:
+                logger.debug(
+                    "State %s (position=%d, symbol=%r): %s",
+                    states[current_state],
+                    head - left,
+                    symbols[tape[head]],
+                    transition,
+                )
 
-            # Add the current state and tape to the execution history
-            # FIXME: crappy code, should be refactored
-            if state in self.final_states:
-                transition = {current_transition.instruction.direction.value: "done"}
-            else:
-                if isinstance(current_transition.instruction, Write):
-                    transition = {
-                        "write": current_transition.instruction.character,
-                        current_transition.instruction.direction.value: state,
+            # Write the character to the tape
+            tape[head] = write
+
+            # Add the current state and tape to the execution history, the
+            # entry of the machine table is copied as the machine may be shared
+            # with other runs
+            if record_history:
+                memory = None
+                if snapshot_tape:
+                    memory = self._snapshot(tape, left, right)
+
+                if not isinstance(transition, str):
+                    transition = dict(transition)
+
+                execution_history.append(
+                    {
+                        "state": states[current_state],
+                        "reading": symbols[tape[head]],
+                        "position": head - left,
+                        "memory": memory,
+                        "transition": transition,
                     }
-                else:
-                    transition = {
-                        "move": current_transition.instruction.direction.value,
-                        current_transition.instruction.direction.value: state,
-                    }
-
-            execution_history.append(
-                {
-                    "state": current_state,
-                    "reading": tape[position],
-                    "position": position,
-                    "memory": [*tape],
-                    "transition": transition,
-                }
-            )
+                )
 
             # Move the tape head
-            position += (
-                1 if current_transition.instruction.direction == Direction.RIGHT else -1
-            )
-
-            print(f"|  New position: {position}")
+            head += delta
 
             # If the machine is in a final state, halt
-            if state in self.final_states:
+            if state in final_states:
                 current_state = state
-                print(f"Got to final state: {state}, halting...")
                 break
 
             # If the tape head is at the left end of the tape, add a blank cell
-            if position < 0:
-                tape.insert(0, self.blank)
-                position = 0
-                print(f"Added blank cell at position 0: {tape}")
+            if head < left:
+                # Double the buffer when its left padding is exhausted
+                if head < 0:
+                    padding = len(tape)
+                    tape = bytearray(padding) + tape
+                    head += padding
+                    right += padding
+
+                left = head
 
             # If the tape head is at the right end of the tape, add a blank cell
-            if position >= len(tape):
-                tape.append(self.blank)
-                print(f"Added blank cell at position {position}: {tape}")
+            if head >= right:
+                # Double the buffer when its right padding is exhausted
+                if head == len(tape):
+                    tape += bytearray(len(tape))
+
+                right = head + 1
 
             # Update the current state
-            current_state = state
-            print(f"|  New state (position={position}): {current_transition}")
+            if state != current_state:
+                current_state = state
+                base = current_state * stride
 
             count += 1
-            if count == steps:
-                break
+
+        logger.debug("Halted in state %s", states[current_state])
 
         # Return the content of the tape, the execution history, and whether
         # the machine has halted in a final state
         return (
-            "".join(tape),
+            self._decode(tape, left, right),
             execution_history,
-            current_state in self.final_states,
+            current_state in final_states,
         )
+
+    def _encode(self, input_: str) -> bytes:
+        """Encode a string as symbol ids.
+
+        Args:
+            input_: symbols to encode, they must be in the alphabet
+
+        Returns:
+            ids of the symbols
+        """
+        if self.encode_table is None:
+            return bytes([self.symbol_ids[symbol] for symbol in input_])
+
+        return input_.encode("latin-1").translate(self.encode_table)
+
+    def _decode(self, tape: bytearray, left: int, right: int) -> str:
+        """Decode the visible part of the tape.
+
+        Args:
+            tape: tape buffer
+            left: index of the first visible cell
+            right: index after the last visible cell
+
+        Returns:
+            content of the tape
+        """
+        if self.decode_table is None:
+            return "".join([self.symbols[cell] for cell in tape[left:right]])
+
+        return tape[left:right].translate(self.decode_table).decode("latin-1")
+
+    def _snapshot(self, tape: bytearray, left: int, right: int) -> List[str]:
+        """Copy the visible part of the tape as a list of symbols.
+
+        Args:
+            tape: tape buffer
+            left: index of the first visible cell
+            right: index after the last visible cell
+
+        Returns:
+            symbols on the tape
+        """
+        if self.decode_table is None:
+            return [self.symbols[cell] for cell in tape[left:right]]
+
+        return list(tape[left:right].translate(self.decode_table).decode("latin-1"))
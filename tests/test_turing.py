@@ -1,3 +1,4 @@
+import logging
 from pathlib import (
     Path,
 )
@@ -13,46 +14,55 @@ from tests.utils import (
     regression_test,
 )
 from turingtoy import (
+    _load_machine,
     run_turing_machine,
 )
+from turingtoy.machine import (
+    ALPHABET_SIZE,
+    TAPE_PADDING,
+)
+
+DOUBLE_1_MACHINE = {
+    "blank": "0",
+    "start state": "e1",
+    "final states": ["done"],
+    "table": {
+        "e1": {
+            "0": {"L": "done"},
+            "1": {"write": "0", "R": "e2"},
+        },
+        "e2": {
+            "1": {"write": "1", "R": "e2"},
+            "0": {"write": "0", "R": "e3"},
+        },
+        "e3": {
+            "1": {"write": "1", "R": "e3"},
+            "0": {"write": "1", "L": "e4"},
+        },
+        "e4": {
+            "1": {"write": "1", "L": "e4"},
+            "0": {"write": "0", "L": "e5"},
+        },
+        "e5": {
+            "1": {"write": "1", "L": "e5"},
+            "0": {"write": "1", "R": "e1"},
+        },
+        "done": {},
+    },
+}
 
 
 def test_turing_machine_double_1(
     request: pytest.FixtureRequest, global_datadir: Path
 ) -> None:
-    machine = {
-        "blank": "0",
-        "start state": "e1",
-        "final states": ["done"],
-        "table": {
-            "e1": {
-                "0": {"L": "done"},
-                "1": {"write": "0", "R": "e2"},
-            },
-            "e2": {
-                "1": {"write": "1", "R": "e2"},
-                "0": {"write": "0", "R": "e3"},
-            },
-            "e3": {
-                "1": {"write": "1", "R": "e3"},
-                "0": {"write": "1", "L": "e4"},
-            },
-            "e4": {
-                "1": {"write": "1", "L": "e4"},
-                "0": {"write": "0", "L": "e5"},
-            },
-            "e5": {
-                "1": {"write": "1", "L": "e5"},
-                "0": {"write": "1", "R": "e1"},
-            },
-            "done": {},
-        },
-    }
+    machine = DOUBLE_1_MACHINE
 
     datadir = global_datadir / "double_1"
 
     input_ = "111"
-    output, execution_history, accepted = run_turing_machine(machine, input_)
+    output, execution_history, accepted = run_turing_machine(
+        machine, input_, record_history=True
+    )
     assert output == "1110111"
     assert accepted
 
@@ -68,7 +78,9 @@ def test_turing_machine_double_1(
     )
 
     input_ = "1"
-    output, execution_history, accepted = run_turing_machine(machine, "1")
+    output, execution_history, accepted = run_turing_machine(
+        machine, "1", record_history=True
+    )
     assert output == "101"
     assert accepted
 
@@ -150,7 +162,9 @@ def test_turing_machine_add_two_binary_numbers(
     datadir = global_datadir / "add_two_binary_numbers"
 
     input_ = "11+1"
-    output, execution_history, accepted = run_turing_machine(machine, input_)
+    output, execution_history, accepted = run_turing_machine(
+        machine, input_, record_history=True
+    )
     assert output == "100 1"
     assert accepted
 
@@ -166,7 +180,9 @@ def test_turing_machine_add_two_binary_numbers(
     )
 
     input_ = "1011+11001"
-    output, execution_history, accepted = run_turing_machine(machine, input_)
+    output, execution_history, accepted = run_turing_machine(
+        machine, input_, record_history=True
+    )
     assert output == "100100 11001"
     assert accepted
 
@@ -289,7 +305,9 @@ def test_turing_machine_binary_multiplication(
     datadir = global_datadir / "binary_multiplication"
 
     input_ = "11*101"
-    output, execution_history, accepted = run_turing_machine(machine, input_)
+    output, execution_history, accepted = run_turing_machine(
+        machine, input_, record_history=True
+    )
     assert output == "1111"
     assert accepted
 
@@ -305,5 +323,227 @@ def test_turing_machine_binary_multiplication(
     )
 
 
+def test_turing_machine_without_history() -> None:
+    output, execution_history, accepted = run_turing_machine(DOUBLE_1_MACHINE, "111")
+    assert output == "1110111"
+    assert execution_history == []
+    assert accepted
+
+
+def test_turing_machine_stay_move() -> None:
+    machine = {
+        "blank": "0",
+        "start state": "erase",
+        "final states": ["done"],
+        "table": {
+            "erase": {"1": {"write": "0", "N": "skip"}},
+            "skip": {"0": {"R": "done"}},
+            "done": {},
+        },
+    }
+
+    output, execution_history, accepted = run_turing_machine(
+        machine, "11", record_history=True
+    )
+    assert output == "010"
+    assert [step["position"] for step in execution_history] == [0, 0]
+    assert accepted
+
+
+def test_turing_machine_cache() -> None:
+    machine = {
+        "blank": " ",
+        "start state": "flip",
+        "final states": ["done"],
+        "table": {
+            "flip": {
+                "0": {"write": "1", "R": "flip"},
+                "1": {"write": "0", "R": "flip"},
+                " ": {"L": "done"},
+            },
+            "done": {},
+        },
+    }
+
+    # The typeguard import hook wraps the cached function when testing
+    cache: Any = _load_machine
+    if not hasattr(cache, "cache_info"):
+        cache = cache.__wrapped__
+    cache.cache_clear()
+
+    assert run_turing_machine(machine, "011") == ("100 ", [], True)
+    assert run_turing_machine(machine, "011") == ("100 ", [], True)
+    assert run_turing_machine(machine, "1") == ("0 ", [], True)
+    assert cache.cache_info().hits == 2
+    assert cache.cache_info().misses == 1
+
+    # Machines that are not JSON serializable are run without the cache
+    machine["final states"] = {"done"}
+    assert run_turing_machine(machine, "011") == ("100 ", [], True)
+    assert cache.cache_info().hits == 2
+    assert cache.cache_info().misses == 1
+
+
+def test_turing_machine_history_is_not_shared() -> None:
+    _, execution_history, _ = run_turing_machine(
+        DOUBLE_1_MACHINE, "1", record_history=True
+    )
+    execution_history[0]["transition"]["R"] = "changed"
+
+    _, execution_history, _ = run_turing_machine(
+        DOUBLE_1_MACHINE, "1", record_history=True
+    )
+    assert execution_history[0]["transition"] == {"write": "0", "R": "e2"}
+    assert DOUBLE_1_MACHINE["table"]["e1"]["1"] == {"write": "0", "R": "e2"}
+
+
+def test_turing_machine_symbols_must_be_strings() -> None:
+    machine = {
+        "blank": "0",
+        "start state": "a",
+        "final states": ["done"],
+        "table": {"a": {1: {"L": "done"}}, "done": {}},
+    }
+
+    with pytest.raises(ValueError, match="Symbol 1 of state a must be a string"):
+        run_turing_machine(machine, "1")
+
+    machine["table"] = {"a": {}, 1: {}, "done": {}}
+    with pytest.raises(ValueError, match="State 1 must be a string"):
+        run_turing_machine(machine, "1")
+
+
+@pytest.mark.parametrize(
+    "instruction",
+    [
+        {"write": "1"},
+        {"write": "1", "L": "done", "R": "done"},
+        {"R": "done", "N": "done"},
+    ],
+)
+def test_turing_machine_one_move_symbol(instruction: Dict[str, str]) -> None:
+    machine = {
+        "blank": "0",
+        "start state": "a",
+        "final states": ["done"],
+        "table": {"a": {"1": instruction}, "done": {}},
+    }
+
+    with pytest.raises(ValueError, match="must have exactly one move symbol"):
+        run_turing_machine(machine, "1")
+
+
+def test_turing_machine_debug_log(caplog: pytest.LogCaptureFixture) -> None:
+    machine = {
+        "blank": "0",
+        "start state": "a",
+        "final states": ["done"],
+        "table": {"a": {"1": {"write": "0", "R": "done"}}, "done": {}},
+    }
+
+    caplog.set_level(logging.DEBUG, logger="turingtoy.machine")
+    assert run_turing_machine(machine, "1") == ("00", [], True)
+    assert [record.getMessage() for record in caplog.records] == [
+        "State a (position=0, symbol='1'): {'write': '0', 'R': 'done'}",
+        "Halted in state done",
+    ]
+
+
+def test_turing_machine_grow_tape_left() -> None:
+    machine = {
+        "blank": "0",
+        "start state": "fill",
+        "final states": ["done"],
+        "table": {
+            "fill": {"1": "L", "0": {"write": "1", "L": "fill"}},
+            "done": {},
+        },
+    }
+
+    steps = 3 * TAPE_PADDING
+    output, execution_history, accepted = run_turing_machine(
+        machine, "1", steps, record_history=True
+    )
+    assert output == "0" + "1" * steps + "0"
+    assert [step["position"] for step in execution_history] == [0] * steps
+    for step in execution_history:
+        assert step["memory"][step["position"]] == step["reading"]
+    assert not accepted
+
+
+def test_turing_machine_grow_tape_right() -> None:
+    machine = {
+        "blank": "0",
+        "start state": "fill",
+        "final states": ["done"],
+        "table": {
+            "fill": {"1": "R", "0": {"write": "1", "R": "fill"}},
+            "done": {},
+        },
+    }
+
+    steps = 3 * TAPE_PADDING
+    output, execution_history, accepted = run_turing_machine(
+        machine, "1", steps, record_history=True
+    )
+    assert output == "1" * steps + "0"
+    assert [step["position"] for step in execution_history] == list(range(steps))
+    for step in execution_history:
+        assert step["memory"][step["position"]] == step["reading"]
+    assert not accepted
+
+
+def test_turing_machine_non_latin_1_blank() -> None:
+    machine = {
+        "blank": "□",
+        "start state": "scan",
+        "final states": ["done"],
+        "table": {
+            "scan": {"1": "R", "□": {"write": "1", "R": "done"}},
+            "done": {},
+        },
+    }
+
+    output, execution_history, accepted = run_turing_machine(
+        machine, "11", record_history=True
+    )
+    assert output == "111"
+    assert [step["memory"] for step in execution_history] == [
+        ["1", "1", "□"],
+        ["1", "1", "□"],
+        ["1", "1", "1"],
+    ]
+    assert accepted
+
+
+def test_turing_machine_alphabet_too_large() -> None:
+    machine = {
+        "blank": "0",
+        "start state": "scan",
+        "final states": [],
+        "table": {
+            "scan": {chr(256 + i): "R" for i in range(ALPHABET_SIZE)},
+        },
+    }
+
+    with pytest.raises(ValueError, match="Alphabet must not contain more than"):
+        run_turing_machine(machine, "1")
+
+
+def test_turing_machine_without_tape_snapshots() -> None:
+    output, execution_history, accepted = run_turing_machine(
+        DOUBLE_1_MACHINE, "111", record_history=True
+    )
+    output_, execution_history_, accepted_ = run_turing_machine(
+        DOUBLE_1_MACHINE, "111", record_history=True, snapshot_tape=False
+    )
+    assert output_ == output
+    assert accepted_ == accepted
+    assert all(step["memory"] is None for step in execution_history_)
+    assert execution_history_ == [
+        {**step, "memory": None} for step in execution_history
+    ]
+
+
 def to_dict(keys: List[str], value: Any) -> Dict[str, Any]:
     return {key: value for key in keys}